@@ -11,18 +11,40 @@ than a generic "Axios 400" in the browser.
 * **2‑D** sheets have one date per row and ≥24 / ≥96 numeric columns.
 
 The detector tolerates a missing *final midnight* row (–1) and ignores extra
-numeric columns in 2‑D layouts.
+numeric columns in 2‑D layouts.  Uploads above 5 MB are analysed on their
+first rows only – two leap years of 15‑minute data, so the first full calendar
+year of a contiguous series always fits; the detail says when this applied.
 """
 
 from __future__ import annotations
 
 import calendar
-from datetime import datetime
-from typing import Final
+import hashlib
+import importlib.util
+import re
+from io import BytesIO
+from typing import TYPE_CHECKING, Final
 
+import numpy as np
 import pandas as pd
 import streamlit as st
-from openpyxl.utils.exceptions import InvalidFileException
+
+if TYPE_CHECKING:
+    from streamlit.runtime.uploaded_file_manager import UploadedFile
+
+# Excel readers, probed once at import rather than on every rerun. calamine is
+# Rust‑based and several times faster than openpyxl on large sheets.
+_HAVE_OPENPYXL: Final = importlib.util.find_spec("openpyxl") is not None
+_HAVE_CALAMINE: Final = importlib.util.find_spec("python_calamine") is not None
+EXCEL_ENGINE: Final = "calamine" if _HAVE_CALAMINE else "openpyxl"
+# openpyxl fallback: streaming reader, cached values instead of formulas.
+EXCEL_ENGINE_KWARGS: Final = {} if _HAVE_CALAMINE else {"read_only": True, "data_only": True}
+
+if _HAVE_OPENPYXL:
+    from openpyxl.utils.exceptions import InvalidFileException
+else:  # calamine‑only install – keep the ``except`` clause in main() valid
+    class InvalidFileException(Exception):  # noqa: N818
+        pass
 
 # ─────────────────────────────── CONSTANTS ───────────────────────────────── #
 HOUR_ROWS_NONLEAP: Final = 8_760
@@ -43,32 +65,76 @@ ACCEPTABLE_15M = {
     Q15_ROWS_LEAP - 1,
 }
 
+# Timestamp layouts seen in exported diagrams, sniffed from the first value so
+# that ``pd.to_datetime`` can skip per‑element format inference.
+DATETIME_FORMATS: Final = (
+    (re.compile(r"\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2})?)?"), "ISO8601"),
+    (re.compile(r"\d{2}\.\d{2}\.\d{4} \d{2}:\d{2}"), "%d.%m.%Y %H:%M"),
+    (re.compile(r"\d{2}\.\d{2}\.\d{4} \d{2}:\d{2}:\d{2}"), "%d.%m.%Y %H:%M:%S"),
+    (re.compile(r"\d{2}\.\d{2}\.\d{4}"), "%d.%m.%Y"),
+    (re.compile(r"\d{2}/\d{2}/\d{4} \d{2}:\d{2}"), "%d/%m/%Y %H:%M"),
+    (re.compile(r"\d{2}/\d{2}/\d{4}"), "%d/%m/%Y"),
+)
+
+HOURLY_START: Final = pd.Timedelta(hours=1)  # first stamp 01‑Jan 01:00
+Q15_START: Final = pd.Timedelta(minutes=15)  # first stamp 01‑Jan 00:15
+
+NS_PER_MINUTE: Final = 60_000_000_000
+MINUTES_PER_DAY: Final = 1_440
+NS_PER_DAY: Final = NS_PER_MINUTE * MINUTES_PER_DAY
+
+INTERVAL_COLS_2D: Final = {24, 96}  # value columns of a well‑formed 2‑D sheet
+EXPECTED_COLS_2D: Final = "≥24"  # pre‑formatted for _explain
+NUMERIC_KINDS: Final = list("iufbc")  # dtype kinds is_numeric_dtype accepts
+
+CACHE_MAX_ENTRIES: Final = 16  # per cached loader – parsed sheets can be large
+
 MAX_UPLOAD_MB: Final = 50  # hard‑stop for very large files (>50 MB)
+LARGE_UPLOAD_BYTES: Final = 5_000_000  # above this, only parse MAX_PARSE_ROWS
+MAX_PARSE_ROWS: Final = 2 * Q15_ROWS_LEAP + 16  # two leap years of 15‑min rows + slack
 
 # ─────────────────────────────── HELPERS ─────────────────────────────────── #
 
+def _sniff_datetime_format(series: pd.Series) -> str | None:
+    non_null = series.dropna()
+    if non_null.empty or not isinstance(non_null.iloc[0], str):
+        return None
+    sample = non_null.iloc[0].strip()
+    for pattern, fmt in DATETIME_FORMATS:
+        if pattern.fullmatch(sample):
+            return fmt
+    return None
+
+
 def _safe_to_datetime(series: pd.Series) -> tuple[pd.Series | None, str | None]:
-    dt = pd.to_datetime(series, errors="coerce")
+    if series.dtype.kind == "M":  # NumPy or Arrow timestamps
+        dt = series  # engine already produced timestamps – skip re‑parsing
+    else:
+        fmt = _sniff_datetime_format(series)
+        dt = pd.to_datetime(series, format=fmt, errors="coerce", cache=True)
+        if fmt is not None and dt.isna().any():
+            # Sniffed layout did not hold for every row – fall back to inference
+            dt = pd.to_datetime(series, errors="coerce", cache=True)
+    if isinstance(dt.dtype, pd.ArrowDtype):
+        # Arrow timestamps → NumPy datetime64 so the detector can use .values
+        dt = dt.astype("datetime64[ns]")
     if dt.isna().any():
         return None, "Failed to parse valid dates/timestamps in the first column."
     return dt, None
 
 
-def _mask_hourly(dt: pd.Series, year: int) -> pd.Series:
-    start = datetime(year, 1, 1, 1)
-    end = datetime(year + 1, 1, 1, 1)
-    return (dt >= start) & (dt < end)
+def _as_ns(dt: pd.Series) -> np.ndarray:
+    """Timestamps as int64 nanoseconds since the epoch (no copy for ns data)."""
+    return dt.to_numpy(dtype="datetime64[ns]").view("int64")
 
 
-def _mask_15m(dt: pd.Series, year: int) -> pd.Series:
-    start = datetime(year, 1, 1, 0, 15)
-    end = datetime(year + 1, 1, 1, 0, 15)
-    return (dt >= start) & (dt < end)
+def _window_counts(dt: pd.Series, start: pd.Timedelta) -> dict[int, int]:
+    """Rows per year window [01‑Jan + *start*, next 01‑Jan + *start*)."""
+    return (dt - start).dt.year.value_counts().to_dict()
 
 
-def _explain(found: int, expected: list[int | str]) -> str:
-    exp = ", ".join(str(e) for e in expected)
-    return f"Found **{found}**, expected **{exp}**."
+def _explain(found: int, expected: str) -> str:
+    return f"Found **{found}**, expected **{expected}**."
 
 
 # ───────────────────────────── CORE DETECTOR ─────────────────────────────── #
@@ -76,19 +142,34 @@ def _explain(found: int, expected: list[int | str]) -> str:
 def detect_format(df: pd.DataFrame) -> tuple[str, str]:
     """Return (*label*, *detail*).  *label* begins with "Error" on failure."""
 
-    df = df.dropna(how="all").dropna(axis=1, how="all").reset_index(drop=True)
+    # Drop fully empty rows/columns from a single NaN scan; skip the copy when
+    # the sheet has no padding at all (the common case).
+    notna = df.notna().to_numpy()
+    row_mask = notna.any(axis=1)
+    col_mask = notna.any(axis=0)
+    if not (row_mask.all() and col_mask.all()):
+        df = df.iloc[row_mask, col_mask]
 
     dt, err = _safe_to_datetime(df.iloc[:, 0])
     if dt is None:
         return "Error – date parsing", err  # type: ignore[return-value]
 
-    has_times = (dt.dt.hour.gt(0) | dt.dt.minute.gt(0)).any()
+    # Minute‑of‑day from the raw int64 view: one pass covers hour and minute.
+    ns = _as_ns(dt)
+    has_times = bool(((ns // NS_PER_MINUTE) % MINUTES_PER_DAY).any())
+
+    # Calendar‑year histogram, shared by both paths (one sort, no hashing).
+    years, year_rows = np.unique(dt.dt.year.to_numpy(), return_counts=True)
+    unique_years = years.tolist()  # already sorted
+    rows_per_year = dict(zip(unique_years, year_rows.tolist()))
 
     # ───────────────────────────── 1‑D PATH ──────────────────────────────── #
     if has_times:
-        for y in sorted({d.year for d in dt}):
+        hourly_rows = _window_counts(dt, HOURLY_START)
+        q15_rows = _window_counts(dt, Q15_START)
+        for y in unique_years:
             # Hourly window
-            rows_h = int(_mask_hourly(dt, y).sum())
+            rows_h = hourly_rows.get(y, 0)
             leap = calendar.isleap(y)
             exp_h_full = HOUR_ROWS_LEAP if leap else HOUR_ROWS_NONLEAP
             if rows_h in ACCEPTABLE_HOURLY:
@@ -99,7 +180,7 @@ def detect_format(df: pd.DataFrame) -> tuple[str, str]:
                 )
 
             # 15‑minute window
-            rows_q = int(_mask_15m(dt, y).sum())
+            rows_q = q15_rows.get(y, 0)
             exp_q_full = Q15_ROWS_LEAP if leap else Q15_ROWS_NONLEAP
             if rows_q in ACCEPTABLE_15M:
                 miss = " (final 00:00 missing)" if rows_q == exp_q_full - 1 else ""
@@ -110,8 +191,8 @@ def detect_format(df: pd.DataFrame) -> tuple[str, str]:
 
         # No acceptable year found
         summaries = [
-            f"{y}: {_mask_hourly(dt, y).sum()}‑hour, {_mask_15m(dt, y).sum()}‑15‑min rows"
-            for y in sorted({d.year for d in dt})
+            f"{y}: {hourly_rows.get(y, 0)}‑hour, {q15_rows.get(y, 0)}‑15‑min rows"
+            for y in unique_years
         ]
         return (
             "Error – no full 1‑D year",
@@ -119,22 +200,30 @@ def detect_format(df: pd.DataFrame) -> tuple[str, str]:
         )  # type: ignore[return-value]
 
     # ───────────────────────────── 2‑D PATH ──────────────────────────────── #
-    if (dt.dt.hour != 0).any() or (dt.dt.minute != 0).any():
+    # has_times is False here, so hour/minute are 00:00; one modulus on the
+    # int64 view also rejects stray seconds / sub‑second residue.
+    if np.any(ns % NS_PER_DAY):
         return (
             "Error – first column contains times",
             "2‑D diagrams must have *dates only* (midnight) in the first column.",
         )  # type: ignore[return-value]
 
-    numeric_cols = [c for c in df.columns[1:] if pd.api.types.is_numeric_dtype(df[c])]
-    n_num = len(numeric_cols)
+    # Well‑formed sheets have exactly 24 / 96 interval columns – trust the
+    # shape; only scan dtypes when extras (e.g. a "Remark" column) are present.
+    n_interval_cols = df.shape[1] - 1
+    if n_interval_cols in INTERVAL_COLS_2D:
+        n_num = n_interval_cols
+    else:
+        kinds = np.array([d.kind for d in df.dtypes.iloc[1:]], dtype="U1")
+        n_num = int(np.isin(kinds, NUMERIC_KINDS).sum())
     if n_num < 24:
-        return "Error – too few interval columns", _explain(n_num, ["≥24"])  # type: ignore[return-value]
+        return "Error – too few interval columns", _explain(n_num, EXPECTED_COLS_2D)  # type: ignore[return-value]
 
     gran = "hourly" if n_num < 96 else "15 minutes"
     expected_cols = 24 if gran == "hourly" else 96
 
-    for y in sorted({d.year for d in dt}):
-        rows = int((dt.dt.year == y).sum())
+    for y in unique_years:
+        rows = rows_per_year[y]
         if rows >= 365:
             extra = n_num - expected_cols
             extra_note = f" (+{extra} extra cols ignored)" if extra else ""
@@ -149,6 +238,54 @@ def detect_format(df: pd.DataFrame) -> tuple[str, str]:
     )  # type: ignore[return-value]
 
 
+# ───────────────────────────── CACHED LOADERS ────────────────────────────── #
+
+def _upload_sha(upl: UploadedFile) -> str:
+    """Digest of the upload, computed once per file and kept in session state."""
+    cached = st.session_state.get("upload_sha")
+    if cached is not None and cached[0] == upl.file_id:
+        return cached[1]
+    sha = hashlib.blake2b(upl.getvalue(), digest_size=8).hexdigest()
+    st.session_state["upload_sha"] = (upl.file_id, sha)
+    return sha
+
+
+# Cache keys are the upload digest; the raw bytes ride along unhashed (``_``).
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _sheet_names(file_sha: str, _file_bytes: bytes) -> list[str]:
+    """List sheets without parsing any of them."""
+    with pd.ExcelFile(
+        BytesIO(_file_bytes), engine=EXCEL_ENGINE, engine_kwargs=EXCEL_ENGINE_KWARGS
+    ) as xls:
+        return list(xls.sheet_names)
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _load_sheet(
+    file_sha: str, sheet: str, nrows: int | None, _file_bytes: bytes
+) -> pd.DataFrame:
+    """Parse only the selected sheet; other sheets are never materialised."""
+    return pd.read_excel(
+        BytesIO(_file_bytes),
+        sheet_name=sheet,
+        engine=EXCEL_ENGINE,
+        engine_kwargs=EXCEL_ENGINE_KWARGS,
+        dtype_backend="pyarrow",
+        nrows=nrows,
+    )
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _detect(
+    file_sha: str, sheet: str, nrows: int | None, _file_bytes: bytes
+) -> tuple[str, str]:
+    df = _load_sheet(file_sha, sheet, nrows, _file_bytes)
+    label, detail = detect_format(df)
+    if nrows is not None and len(df) >= nrows:
+        detail += f" Large upload: only the first {nrows:,} rows were analysed."
+    return label, detail
+
+
 # ───────────────────────────── STREAMLIT UI ──────────────────────────────── #
 
 def main() -> None:  # noqa: D401
@@ -156,10 +293,11 @@ def main() -> None:  # noqa: D401
     st.title("⚡ Electricity Diagram Format Recognizer")
 
     # Dependency check
-    try:
-        import openpyxl  # noqa: F401 – presence check
-    except ModuleNotFoundError:
-        st.error("Install **openpyxl** with `pip install openpyxl` and restart the app.")
+    if not (_HAVE_OPENPYXL or _HAVE_CALAMINE):
+        st.error(
+            "Install **python-calamine** or **openpyxl** with "
+            "`pip install python-calamine` and restart the app."
+        )
         st.stop()
 
     upl = st.file_uploader("Upload an XLSX workbook", type=["xlsx", "xls"])
@@ -172,9 +310,12 @@ def main() -> None:  # noqa: D401
         st.error(f"File exceeds {MAX_UPLOAD_MB} MB upload limit. Please provide a smaller file.")
         st.stop()
 
+    file_bytes = upl.getvalue()
+    file_sha = _upload_sha(upl)
+
     # Attempt to open workbook
     try:
-        xls = pd.ExcelFile(upl)
+        sheet_names = _sheet_names(file_sha, file_bytes)
     except InvalidFileException as exc:
         st.error("❌ The file appears to be corrupted or not a valid XLSX.")
         st.exception(exc)
@@ -184,13 +325,14 @@ def main() -> None:  # noqa: D401
         st.exception(exc)
         st.stop()
 
-    sheet = xls.sheet_names[0]
-    if len(xls.sheet_names) > 1:
-        sheet = st.selectbox("Select sheet", xls.sheet_names)
+    sheet = sheet_names[0]
+    if len(sheet_names) > 1:
+        sheet = st.selectbox("Select sheet", sheet_names)
 
-    # Parse selected sheet
+    # Parse selected sheet (row‑capped for large uploads)
+    nrows = MAX_PARSE_ROWS if upl.size > LARGE_UPLOAD_BYTES else None
     try:
-        df = xls.parse(sheet)
+        df = _load_sheet(file_sha, sheet, nrows, file_bytes)
     except Exception as exc:  # noqa: BLE001
         st.error("❌ Failed to parse the selected sheet.")
         st.exception(exc)
@@ -201,7 +343,7 @@ def main() -> None:  # noqa: D401
 
     # Detect format with safety net
     try:
-        label, detail = detect_format(df)
+        label, detail = _detect(file_sha, sheet, nrows, file_bytes)
     except Exception as exc:  # noqa: BLE001
         st.error("❌ Unexpected error while analysing the sheet.")
         st.exception(exc)